@@ -5,24 +5,105 @@ import random
 import re
 import string
 import time
-import uuid
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
-from typing import Union, Callable, Any, AsyncGenerator, Dict, Optional, List
+from json.decoder import scanstring
+from secrets import token_hex
+from typing import Union, Callable, Any, AsyncGenerator, Awaitable, Dict, Optional, List, Tuple
 
+import orjson
 from curl_cffi.requests.exceptions import RequestException
 from sse_starlette import EventSourceResponse
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse
 
 from app.errors import CursorWebError
 from app.models import ChatCompletionRequest, OpenAIToolCallFunction
 
+# 匹配包含工具调用的JSON代码块
+_TOOL_JSON_BLOCK_RE = re.compile(
+    r'```(?:json|JSON)?\s*\n*(\{.*?"name".*?"arguments".*?\})\s*\n*```',
+    re.DOTALL
+)
+
+# 从任意位置解析一个完整JSON对象，用于定位内联工具调用的边界
+_JSON_DECODER = json.JSONDecoder()
+
+# JSON中允许的空白字符
+_JSON_WS_RE = re.compile(r'[ \t\n\r]*')
+
+# 工具调用起始特征（'"name"' 或 '```'）可能被拆分到相邻两块中，需要保留上一块末尾的字符数
+_TOOL_MARKER_TAIL_LEN = len('"name"') - 1
+
+# 流式响应中增量检测工具调用时至少检查末尾这么多字符，首个工具调用特征之后的内容总会被检查
+_TOOL_SCAN_WINDOW = 4096
+
+# 流式响应合并小块内容的字符数上限和最长等待时间（秒）
+_COALESCE_MAX_CHARS = 256
+_COALESCE_MAX_DELAY = 0.005
+
+# 已按SSE格式编码好的事件前后缀，与 EventSourceResponse 默认的 \r\n 分隔符一致
+_SSE_DATA_PREFIX = b"data: "
+_SSE_EVENT_END = b"\r\n\r\n"
+
+# 流式响应各类块中 delta 及之后的JSON部分，与stream_chat_completion中按请求构造的头部配合使用
+_INITIAL_CHUNK_TAIL = b'{"role":"assistant","content":""},"finish_reason":null}]}' + _SSE_EVENT_END
+_CONTENT_CHUNK_OPEN = b'{"content":'
+_CONTENT_CHUNK_TAIL = b'},"finish_reason":null}]}' + _SSE_EVENT_END
+_STOP_CHUNK_TAIL = b'{},"finish_reason":"stop"}]}' + _SSE_EVENT_END
+_TOOL_CALLS_CHUNK_TAIL = b'{},"finish_reason":"tool_calls"}]}' + _SSE_EVENT_END
+_SSE_DONE = _SSE_DATA_PREFIX + b"[DONE]" + _SSE_EVENT_END
+
+# 流式响应的HTTP头
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+# 随机字符串的字符集：大小写字母和数字，使用 bytes 以便直接构造结果
+_ALPHANUM_B = (string.ascii_letters + string.digits).encode('ascii')
+
+# to_async 使用的线程池，由 _get_executor 延迟创建
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+class _PeekedAsyncIterator:
+    """
+    已预取第一个值的异步迭代器
+    第一次返回预取的值，之后 __anext__ 直接返回原生成器的 awaitable，不额外包一层协程
+    """
+
+    def __init__(self, first_item: Any, generator: AsyncGenerator):
+        self._first_item = first_item
+        self._has_first = True
+        self._generator = generator
+        self._anext = generator.__anext__
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self) -> Awaitable:
+        if self._has_first:
+            self._has_first = False
+            # 用已完成的 Future 返回预取的值，await 时立即得到结果
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(self._first_item)
+            self._first_item = None
+            return future
+        return self._anext()
+
+    def aclose(self) -> Awaitable:
+        return self._generator.aclose()
+
 
 async def safe_stream_wrapper(
-        generator_func, *args, **kwargs
-) -> Union[EventSourceResponse, JSONResponse]:
+        generator_func, *args, raw: bool = False, **kwargs
+) -> Union[EventSourceResponse, StreamingResponse, JSONResponse]:
     """
     安全的流响应包装器
     先执行生成器获取第一个值，如果成功才创建流响应
+    raw 为 True 时生成器需产出编码好的SSE事件字节，使用 StreamingResponse 直接写出，
+    跳过 EventSourceResponse 的逐事件处理（不发送 ping 保活）
     """
     # 创建生成器实例
     generator = generator_func(*args, **kwargs)
@@ -30,72 +111,68 @@ async def safe_stream_wrapper(
     # 尝试获取第一个值
     first_item = await generator.__anext__()
 
-    # 如果成功获取第一个值，创建新的生成器包装原生成器
-    async def wrapped_generator():
-        # 先yield第一个值
-        yield first_item
-        # 然后yield剩余的值
-        async for item in generator:
-            yield item
-
-    # 创建流响应
-    return EventSourceResponse(
-        wrapped_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
+    # 创建流响应，先返回第一个值，之后直接迭代原生成器
+    content = _PeekedAsyncIterator(first_item, generator)
+    if raw:
+        return StreamingResponse(content, media_type="text/event-stream", headers=_SSE_HEADERS)
+    return EventSourceResponse(content, media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
+def _to_error_response(e: Union[CursorWebError, RequestException]) -> JSONResponse:
+    """将最终失败的异常转换为OpenAI格式的错误响应"""
+    if isinstance(e, CursorWebError):
+        return JSONResponse(
+            e.to_openai_error(),
+            status_code=e.response_status_code
+        )
+    return JSONResponse(
+        {
+            'error': {
+                'message': str(e),
+                "type": "http_error",
+                "code": "http_error"
+            }
         },
+        status_code=500
     )
 
 
 async def error_wrapper(func: Callable, *args, **kwargs) -> Any:
     from .config import MAX_RETRIES
-    for attempt in range(MAX_RETRIES + 1):  # 包含初始尝试，所以是 MAX_RETRIES + 1
+    last_exc = None
+    for _ in range(MAX_RETRIES + 1):  # 包含初始尝试，所以是 MAX_RETRIES + 1
         try:
             return await func(*args, **kwargs)
         except (CursorWebError, RequestException) as e:
+            last_exc = e
+
+    # 已经达到最大重试次数，返回错误响应
+    return _to_error_response(last_exc)
 
-            # 如果已经达到最大重试次数，返回错误响应
-            if attempt == MAX_RETRIES:
-                if isinstance(e, CursorWebError):
-                    return JSONResponse(
-                        e.to_openai_error(),
-                        status_code=e.response_status_code
-                    )
-                elif isinstance(e, RequestException):
-                    return JSONResponse(
-                        {
-                            'error': {
-                                'message': str(e),
-                                "type": "http_error",
-                                "code": "http_error"
-                            }
-                        },
-                        status_code=500
-                    )
-
-            if attempt < MAX_RETRIES:
-                continue
-    return None
 
+def decode_base64url_safe(data: Union[str, bytes]) -> bytes:
+    """使用安全的base64url解码，支持 str 和 bytes 输入"""
+    if isinstance(data, str):
+        data = data.encode('ascii')
 
-def decode_base64url_safe(data):
-    """使用安全的base64url解码"""
-    # 添加必要的填充
-    missing_padding = len(data) % 4
-    if missing_padding:
-        data += '=' * (4 - missing_padding)
+    # 添加必要的填充，(-len) & 3 即补齐到4的倍数所需的 '=' 个数
+    return base64.urlsafe_b64decode(data + b'=' * (-len(data) & 3))
 
-    return base64.urlsafe_b64decode(data)
+
+def _get_executor() -> ThreadPoolExecutor:
+    """获取 to_async 专用的线程池，首次使用时按配置创建，不与默认线程池共享"""
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        from .config import EXECUTOR_WORKERS
+        _EXECUTOR = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="cursorweb-io")
+    return _EXECUTOR
 
 
 def to_async(sync_func):
     @wraps(sync_func)
     async def async_wrapper(*args):
         loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, sync_func, *args)
+        return await loop.run_in_executor(_get_executor(), sync_func, *args)
 
     return async_wrapper
 
@@ -104,12 +181,171 @@ def generate_random_string(length):
     """
     生成一个指定长度的随机字符串，包含大小写字母和数字。
     """
-    # 定义所有可能的字符：大小写字母和数字
-    characters = string.ascii_letters + string.digits
+    # 使用 random.choices 一次性从字符集中随机选择 length 个字节，再整体解码为字符串
+    return bytes(random.choices(_ALPHANUM_B, k=length)).decode('ascii')
+
+
+def _to_sse_event(payload: Dict) -> bytes:
+    """将数据序列化为一条编码好的SSE data事件"""
+    # orjson 输出不含原始换行，整条JSON可以放在同一个 data 行中
+    return _SSE_DATA_PREFIX + orjson.dumps(payload) + _SSE_EVENT_END
+
+
+def _may_close_tool_call(chunk: str) -> bool:
+    """内容块中是否包含可能结束工具调用的字符"""
+    return '}' in chunk or '`' in chunk
+
+
+async def _coalesce_chunks(
+        generator: AsyncGenerator[str, None],
+        max_chars: int = _COALESCE_MAX_CHARS,
+        max_delay: float = _COALESCE_MAX_DELAY
+) -> AsyncGenerator[str, None]:
+    """
+    合并短时间内连续到达的小块内容，减少发送的SSE事件数量
+    距上次输出已超过 max_delay 秒才到达的块直接输出，不创建任务也不等待；
+    连续到达的块先缓冲，缓冲区达到 max_chars 个字符，或第一块缓冲后超过 max_delay 秒仍无新内容时输出
+    可能结束工具调用的块总是在输出缓冲内容后单独输出，保证检测到工具调用时之前的内容都已发送
+    等待超时不会取消对原生成器的读取，未完成的读取留到下一轮继续等待
+    """
+    loop = asyncio.get_running_loop()
+    pending = None
+    buffer = []
+    buffer_len = 0
+    deadline = 0.0
+    last_yield = float('-inf')
+    try:
+        while True:
+            if buffer:
+                # 有缓冲内容时才需要带超时等待，此时把读取放进任务里
+                if pending is None:
+                    pending = asyncio.ensure_future(generator.__anext__())
+                done, _ = await asyncio.wait({pending}, timeout=max(deadline - loop.time(), 0))
+                if not done:
+                    yield "".join(buffer)
+                    buffer = []
+                    buffer_len = 0
+                    last_yield = loop.time()
+                    continue
+
+            # 没有缓冲内容时直接等待下一块，上一轮超时留下的读取则继续等待它完成
+            next_chunk, pending = (pending if pending is not None else generator.__anext__()), None
+            try:
+                chunk = await next_chunk
+            except StopAsyncIteration:
+                break
+            except Exception:
+                # 上游出错时先输出已缓冲的内容
+                if buffer:
+                    yield "".join(buffer)
+                raise
+            if not chunk:
+                continue
+
+            now = loop.time()
+            if _may_close_tool_call(chunk):
+                if buffer:
+                    yield "".join(buffer)
+                    buffer = []
+                    buffer_len = 0
+                yield chunk
+                last_yield = loop.time()
+                continue
+            if not buffer and now - last_yield >= max_delay:
+                # 内容到达较慢，没有可合并的内容，直接输出
+                yield chunk
+                last_yield = loop.time()
+                continue
+
+            if not buffer:
+                deadline = now + max_delay
+            buffer.append(chunk)
+            buffer_len += len(chunk)
+            if buffer_len >= max_chars:
+                yield "".join(buffer)
+                buffer = []
+                buffer_len = 0
+                last_yield = loop.time()
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        # 提前结束时停止未完成的读取并关闭原生成器
+        if pending is not None:
+            pending.cancel()
+            # asyncio.wait 不会因 pending 被取消而抛出异常，当前任务自身被取消时仍会正常传播
+            await asyncio.wait({pending})
+            if not pending.cancelled():
+                pending.exception()  # 取出结果，避免未读取异常的警告
+        await generator.aclose()
+
+
+class _ToolCallScanner:
+    """
+    分块收集生成内容并增量检测工具调用
+    只在出现工具调用特征、且新内容可能闭合JSON时才重新解析，避免每块都扫描全部内容
+    检测从首个起始特征处（或末尾 _TOOL_SCAN_WINDOW 个字符，取更靠前者）开始，
+    工具调用不会早于首个起始特征出现，因此无需扫描之前的内容
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._length = 0
+        self._last_scanned_len = 0
+        self._saw_candidate = False  # 是否出现过工具调用的起始特征
+        self._candidate_offset = 0  # 首个起始特征在全部内容中的位置
+        self._marker_tail = ""  # 上一块末尾的几个字符，用于识别被拆分到两块中的起始特征
+        self._pending_closer = False  # 上次检测后是否出现过可能结束工具调用的字符
+
+    def feed(self, chunk: str) -> Optional[List[Dict]]:
+        """追加一块内容，必要时检测工具调用"""
+        if chunk:
+            self._parts.append(chunk)
+            self._length += len(chunk)
+            if not self._saw_candidate:
+                probe = self._marker_tail + chunk
+                offsets = [i for i in (probe.find('"name"'), probe.find('```')) if i != -1]
+                if offsets:
+                    self._saw_candidate = True
+                    # 内联格式从 '{"name"' 开始，多留出一个字符
+                    probe_start = self._length - len(probe)
+                    self._candidate_offset = max(probe_start + min(offsets) - 1, 0)
+                else:
+                    self._marker_tail = probe[-_TOOL_MARKER_TAIL_LEN:]
+            if _may_close_tool_call(chunk):
+                self._pending_closer = True
+
+        if self._saw_candidate and self._pending_closer:
+            return self._scan()
+        return None
+
+    def finish(self) -> Optional[List[Dict]]:
+        """内容结束时对上次检测后新增的内容做最后一次检测"""
+        if self._saw_candidate and self._length > self._last_scanned_len:
+            return self._scan()
+        return None
 
-    # 使用 random.choice 从字符集中随机选择字符，重复 length 次，然后拼接起来
-    random_string = ''.join(random.choice(characters) for _ in range(length))
-    return random_string
+    def text(self) -> str:
+        """返回目前收集到的全部内容"""
+        return "".join(self._parts)
+
+    def _scan(self) -> Optional[List[Dict]]:
+        self._last_scanned_len = self._length
+        self._pending_closer = False
+        scan_len = self._length - min(self._candidate_offset, max(self._length - _TOOL_SCAN_WINDOW, 0))
+        if scan_len >= self._length:
+            return extract_tool_calls_from_response(self.text())
+
+        # 只拼接覆盖检测范围的最后几块，再从检测范围起点开始检测
+        tail_parts = []
+        tail_len = 0
+        for part in reversed(self._parts):
+            tail_parts.append(part)
+            tail_len += len(part)
+            if tail_len >= scan_len:
+                break
+        tail = "".join(reversed(tail_parts))
+        return extract_tool_calls_from_response(tail, search_from=tail_len - scan_len)
 
 
 async def non_stream_chat_completion(
@@ -119,16 +355,22 @@ async def non_stream_chat_completion(
     """
     非流式响应：接受外部异步生成器，收集所有输出返回完整响应
     """
-    # 收集所有流式输出
-    full_content = ""
-    full_delta = ""  # 用于累积SSE数据来检测工具调用
+    # 收集所有流式输出，同时检测工具调用
+    scanner = _ToolCallScanner()
+    tool_calls = None
 
     async for chunk in generator:
-        full_content += chunk
-        full_delta += chunk if chunk else ""
+        tool_calls = scanner.feed(chunk)
+        if tool_calls:
+            # 已解析出完整的工具调用，后续内容不会出现在工具调用响应中，无需继续等待
+            await generator.aclose()
+            break
+    else:
+        # 检查剩余内容是否包含工具调用
+        tool_calls = scanner.finish()
 
-    # 检查是否包含工具调用
-    tool_calls = extract_tool_calls_from_response(full_delta)
+    chat_id = f"chatcmpl-{token_hex(15)[:29]}"
+    created_time = int(time.time())
 
     if tool_calls:
         # 返回工具调用格式响应
@@ -136,20 +378,20 @@ async def non_stream_chat_completion(
             "model": request.model,
             "input_tokens": 0,
             "output_tokens": 0
-        }, tool_calls)
+        }, tool_calls, chat_id, created_time)
     else:
         # 构造OpenAI格式的普通响应
         response = {
-            "id": f"chatcmpl-{uuid.uuid4().hex[:29]}",
+            "id": chat_id,
             "object": "chat.completion",
-            "created": int(time.time()),
+            "created": created_time,
             "model": request.model,
             "choices": [
                 {
                     "index": 0,
                     "message": {
                         "role": "assistant",
-                        "content": full_content
+                        "content": scanner.text()
                     },
                     "finish_reason": "stop"
                 }
@@ -167,220 +409,179 @@ async def non_stream_chat_completion(
 async def stream_chat_completion(
         request: ChatCompletionRequest,
         generator: AsyncGenerator[str, None]
-) -> AsyncGenerator[Dict[str, Any], None]:
+) -> AsyncGenerator[bytes, None]:
     """
     流式响应：接受外部异步生成器，包装成OpenAI SSE格式
+    直接产出编码好的SSE事件字节，EventSourceResponse 会原样写出
     """
-    chat_id = f"chatcmpl-{uuid.uuid4().hex[:29]}"
+    chat_id = f"chatcmpl-{token_hex(15)[:29]}"
     created_time = int(time.time())
 
+    # 各块中id、created、model对整个请求不变，预先拼好到 delta 为止的JSON头部
+    chunk_head = _SSE_DATA_PREFIX + (
+        f'{{"id":"{chat_id}","object":"chat.completion.chunk","created":{created_time},'
+        f'"model":'
+    ).encode() + orjson.dumps(request.model) + b',"choices":[{"index":0,"delta":'
+    content_prefix = chunk_head + _CONTENT_CHUNK_OPEN
+
     is_send_init = False
 
-    # 初始化工具调用内容
-    full_delta = ""
+    # 分块收集内容并检测工具调用
+    scanner = _ToolCallScanner()
+    tool_calls = None
+
+    # 合并连续到达的小块内容，每个SSE事件携带更多内容
+    generator = _coalesce_chunks(generator)
 
     # 检查是否有工具调用内容，但不立即发送初始响应
     async for chunk in generator:
-        full_delta += chunk if chunk else ""
-
-        # 检查是否有工具调用内容
-        tool_calls = extract_tool_calls_from_response(full_delta)
-
+        tool_calls = scanner.feed(chunk)
         if tool_calls:
-            # 如果检测到工具调用，则发送工具调用的流式响应
-            for i, tool_call in enumerate(tool_calls):
-                # 发送工具调用数据，索引对应tools列表中的索引
-                tool_chunk = create_sse_tool_call_chunk(i, tool_call, is_complete=(i == len(tool_calls) - 1))
-                yield tool_chunk
-
-            # 发送结束标记
-            final_response = {
-                "id": chat_id,
-                "object": "chat.completion.chunk",
-                "created": created_time,
-                "model": request.model,
-                "choices": [
-                    {
-                        "index": 0,
-                        "delta": {},
-                        "finish_reason": "tool_calls"
-                    }
-                ]
-            }
-            yield {"data": json.dumps(final_response, ensure_ascii=False)}
-            yield {"data": "[DONE]"}
-            return
+            await generator.aclose()
+            break
 
         # 如果不是工具调用，发送普通内容
         if not is_send_init:
-            initial_response = {
-                "id": chat_id,
-                "object": "chat.completion.chunk",
-                "created": created_time,
-                "model": request.model,
-                "choices": [
-                    {
-                        "index": 0,
-                        "delta": {"role": "assistant", "content": ""},
-                        "finish_reason": None
-                    }
-                ]
-            }
-            yield {
-                "data": json.dumps(initial_response, ensure_ascii=False)
-            }
+            yield chunk_head + _INITIAL_CHUNK_TAIL
             is_send_init = True
 
-        chunk_response = {
-            "id": chat_id,
-            "object": "chat.completion.chunk",
-            "created": created_time,
-            "model": request.model,
-            "choices": [
-                {
-                    "index": 0,
-                    "delta": {"content": chunk},
-                    "finish_reason": None
-                }
-            ]
-        }
-        yield {"data": json.dumps(chunk_response, ensure_ascii=False)}
+        # 只序列化变化的content，其余部分使用预先构造好的模板
+        yield content_prefix + orjson.dumps(chunk) + _CONTENT_CHUNK_TAIL
+
+    # 流结束时对未检查过的剩余内容做最后一次检测
+    if not tool_calls:
+        tool_calls = scanner.finish()
+
+    if tool_calls:
+        # 如果检测到工具调用，则发送工具调用的流式响应
+        for i, tool_call in enumerate(tool_calls):
+            # 发送工具调用数据，索引对应tools列表中的索引
+            tool_chunk = create_sse_tool_call_chunk(
+                i, tool_call, chat_id, created_time, is_complete=(i == len(tool_calls) - 1)
+            )
+            yield tool_chunk
 
     # 发送结束标记
-    final_response = {
-        "id": chat_id,
-        "object": "chat.completion.chunk",
-        "created": created_time,
-        "model": request.model,
-        "choices": [
-            {
-                "index": 0,
-                "delta": {},
-                "finish_reason": "stop"
-            }
-        ]
-    }
-    yield {"data": json.dumps(final_response, ensure_ascii=False)}
-    yield {"data": "[DONE]"}
+    yield chunk_head + (_TOOL_CALLS_CHUNK_TAIL if tool_calls else _STOP_CHUNK_TAIL)
+    yield _SSE_DONE
 
 
-def parse_tool_call_from_content(content: str) -> Optional[Dict]:
+def _decode_tool_object(content: str, start: int) -> Tuple[Dict, Optional[str]]:
+    """
+    从 start 处的 '{' 开始解析一个JSON对象，顶层键值逐个交给JSON解码器解析
+    返回 (对象, arguments 的原始JSON文本)，arguments 不存在或本身是字符串时原始文本为 None
+    """
+    tool_data = {}
+    raw_arguments = None
+    pos = _JSON_WS_RE.match(content, start + 1).end()
+    if content.startswith('}', pos):
+        return tool_data, None
+
+    while True:
+        if not content.startswith('"', pos):
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes", content, pos)
+        key, pos = scanstring(content, pos + 1)
+        pos = _JSON_WS_RE.match(content, pos).end()
+        if not content.startswith(':', pos):
+            raise json.JSONDecodeError("Expecting ':' delimiter", content, pos)
+        value_start = _JSON_WS_RE.match(content, pos + 1).end()
+        value, pos = _JSON_DECODER.raw_decode(content, value_start)
+        tool_data[key] = value
+        if key == 'arguments':
+            raw_arguments = None if isinstance(value, str) else content[value_start:pos]
+
+        pos = _JSON_WS_RE.match(content, pos).end()
+        if content.startswith('}', pos):
+            return tool_data, raw_arguments
+        if not content.startswith(',', pos):
+            raise json.JSONDecodeError("Expecting ',' delimiter", content, pos)
+        pos = _JSON_WS_RE.match(content, pos + 1).end()
+
+
+def parse_tool_call_from_content(content: str, search_from: int = 0) -> Tuple[Optional[Dict], Optional[str]]:
     """
     从响应内容中识别和解析工具调用
     支持JSON代码块格式及直接工具调用格式
+    search_from 指定从内容的哪个位置开始查找
+    返回 (工具调用数据, arguments 的原始JSON文本)，未识别到工具调用时返回 (None, None)
     """
     try:
         # 检查JSON代码块格式的工具调用（更快，先检查）
-        if '```' in content:
+        if content.find('```', search_from) != -1:
             # 匹配更具体，查找工具调用相关的JSON代码块
-            json_match = re.search(
-                r'```(?:json|JSON)?\s*\n*(\{.*?"name".*?"arguments".*?\})\s*\n*```',
-                content,
-                re.DOTALL
-            )
+            json_match = _TOOL_JSON_BLOCK_RE.search(content, search_from)
             if json_match:
                 try:
-                    tool_data = json.loads(json_match.group(1))
-                    if isinstance(tool_data, dict) and 'name' in tool_data and 'arguments' in tool_data:
-                        return tool_data
-                except (json.JSONDecodeError, IndexError):
+                    tool_data, raw_arguments = _decode_tool_object(content, json_match.start(1))
+                    if 'name' in tool_data and 'arguments' in tool_data:
+                        return tool_data, raw_arguments
+                except json.JSONDecodeError:
                     pass
 
         # 检查内联JSON格式（只在有基本关键词时检查以提高性能）
         # 更精确地匹配工具调用结构
-        if ('"name"' in content and '"arguments"' in content):
-            # 尝试查找第一个可能的完整JSON对象（带合理的大小限制，防止正则复杂度过高）
-            # 在工具调用中通常JSON结构不会太复杂，所以限制搜索范围
-            start_pos = content.find('{"name"')
+        if content.find('"name"', search_from) != -1 and content.find('"arguments"', search_from) != -1:
+            # 尝试查找第一个可能的完整JSON对象
+            start_pos = content.find('{"name"', search_from)
             if start_pos != -1:
-                # 找到可能的起始点，尝试查找对应的结束
-                end_pos = start_pos
-                level = 0
-                in_string = False
-                escape_next = False
-
-                # 自行解析对象边界，而不用复杂的正则
-                for i in range(start_pos, min(start_pos + 1000, len(content))):  # 限制搜索范围
-                    char = content[i]
-                    if escape_next:
-                        escape_next = False
-                        continue
-                    if char == '\\':
-                        escape_next = True
-                    elif char == '"' and not escape_next:
-                        in_string = not in_string
-                    elif not in_string:
-                        if char == '{':
-                            level += 1
-                        elif char == '}':
-                            level -= 1
-                            if level == 0:
-                                end_pos = i + 1
-                                break
-
-                if end_pos > start_pos:
-                    potential_json = content[start_pos:end_pos]
-                    try:
-                        tool_data = json.loads(potential_json)
-                        if isinstance(tool_data, dict) and 'name' in tool_data and 'arguments' in tool_data:
-                            return tool_data
-                    except json.JSONDecodeError:
-                        pass
+                # 由JSON解码器直接从起始点解析出一个完整对象并确定边界，忽略其后的内容
+                try:
+                    tool_data, raw_arguments = _decode_tool_object(content, start_pos)
+                    if 'name' in tool_data and 'arguments' in tool_data:
+                        return tool_data, raw_arguments
+                except json.JSONDecodeError:
+                    pass
     except Exception:
         # 如果解析过程中出现任何错误，返回None
         pass
 
-    return None
+    return None, None
 
 
-def extract_tool_calls_from_response(content: str) -> Optional[List[Dict]]:
+def extract_tool_calls_from_response(content: str, search_from: int = 0) -> Optional[List[Dict]]:
     """
     从响应内容中提取工具调用信息
     按照OpenAI标准格式返回
+    search_from 指定从内容的哪个位置开始查找
     """
     try:
         # 快速检查是否可能存在工具调用（避免不必要的处理）
-        if not ('function_call' in content or ('name' in content and 'arguments' in content)):
+        # 代码块和内联两种格式都必须包含 "arguments" 键，单次子串查找即可排除
+        if content.find('"arguments"', search_from) == -1:
             return None
 
-        tool_calls = []
-
-        tool_data = parse_tool_call_from_content(content)
-        if tool_data and 'name' in tool_data:
-            try:
-                tool_call_id = f"call_{str(uuid.uuid4())[:8]}"
-                arguments = tool_data.get('arguments', {})
-                # 确保arguments是字符串，如果不是则序列化
-                if not isinstance(arguments, str):
-                    arguments = json.dumps(arguments)
-
-                tool_call = {
-                    "id": tool_call_id,
-                    "type": "function",
-                    "function": {
-                        "name": tool_data['name'],
-                        "arguments": arguments
-                    }
-                }
-                tool_calls.append(tool_call)
-            except Exception:
-                # 如果在构建工具调用时发生错误，跳过这个工具调用
-                pass
+        tool_data, raw_arguments = parse_tool_call_from_content(content, search_from)
+        if not tool_data:
+            return None
 
-        return tool_calls if tool_calls else None
+        arguments = tool_data['arguments']
+        # 确保arguments是字符串，非字符串时直接使用原始JSON文本，避免重新序列化
+        # _decode_tool_object 对非字符串的 arguments 总会返回其原始文本
+        if not isinstance(arguments, str):
+            arguments = raw_arguments
+
+        return [{
+            "id": f"call_{token_hex(4)}",
+            "type": "function",
+            "function": {
+                "name": tool_data['name'],
+                "arguments": arguments
+            }
+        }]
     except Exception:
         # 如果在处理过程中出现任何错误，返回None
         return None
 
 
-def create_tool_call_response(message_data: Dict, tool_calls: List[Dict]) -> Dict:
+def create_tool_call_response(message_data: Dict, tool_calls: List[Dict], chat_id: str, created: int) -> Dict:
     """
     创建符合OpenAI标准的工具调用响应格式
+    chat_id 和 created 由调用方按请求生成后传入
     """
     return {
-        "id": f"chatcmpl-{str(uuid.uuid4())[:8]}",
+        "id": chat_id,
         "object": "chat.completion",
-        "created": int(time.time()),
+        "created": created,
         "model": message_data.get("model", "default-model"),
         "choices": [{
             "index": 0,
@@ -400,14 +601,21 @@ def create_tool_call_response(message_data: Dict, tool_calls: List[Dict]) -> Dic
     }
 
 
-def create_sse_tool_call_chunk(index: int, tool_call_data: Dict, is_complete: bool = False) -> Dict:
+def create_sse_tool_call_chunk(
+        index: int,
+        tool_call_data: Dict,
+        chat_id: str,
+        created: int,
+        is_complete: bool = False
+) -> bytes:
     """
     创建符合OpenAI标准的SSE工具调用响应格式
+    chat_id 和 created 沿用流式响应中已生成的值
     """
     chunk = {
-        "id": f"chatcmpl-{str(uuid.uuid4())[:8]}",
+        "id": chat_id,
         "object": "chat.completion.chunk",
-        "created": int(time.time()),
+        "created": created,
         "model": "default-model",
         "choices": [{
             "index": index,
@@ -425,4 +633,4 @@ def create_sse_tool_call_chunk(index: int, tool_call_data: Dict, is_complete: bo
             "finish_reason": "tool_calls" if is_complete else None
         }]
     }
-    return {"data": json.dumps(chunk, ensure_ascii=False)}
+    return _to_sse_event(chunk)
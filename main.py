@@ -1,4 +1,3 @@
-import json
 import os
 import shutil
 import subprocess
@@ -6,12 +5,13 @@ import tempfile
 import time
 from typing import Optional
 
+import orjson
 from curl_cffi import AsyncSession, Response
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from loguru import logger
 
-from app.config import SCRIPT_URL, FP, API_KEY, MODELS
+from app.config import SCRIPT_URL, FP, API_KEY, MODELS, RAW_STREAM
 from app.errors import CursorWebError
 from app.models import ChatCompletionRequest, Message, ModelsResponse, Model
 from app.utils import error_wrapper, to_async, generate_random_string, non_stream_chat_completion, \
@@ -39,7 +39,8 @@ async def chat_completions(
     #     logger.debug(c)
 
     if request.stream:
-        return await error_wrapper(safe_stream_wrapper, stream_chat_completion, request, chat_generator)
+        return await error_wrapper(safe_stream_wrapper, stream_chat_completion, request, chat_generator,
+                                   raw=RAW_STREAM)
     else:
         return await error_wrapper(non_stream_chat_completion, request, chat_generator)
 
@@ -153,13 +154,13 @@ async def cursor_chat(request: ChatCompletionRequest):
                     continue
                 if data and data.strip():
                     try:
-                        event_data = json.loads(data)
+                        event_data = orjson.loads(data)
                         delta = event_data.get('delta')
                         # logger.debug(delta)
                         if not delta:
                             continue
                         yield delta
-                    except json.JSONDecodeError:
+                    except orjson.JSONDecodeError:
                         continue
 
 